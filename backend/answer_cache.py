@@ -0,0 +1,58 @@
+"""
+Semantic answer cache for Ultra Doc-Intelligence
+Reuses answers for paraphrased questions about the same document
+"""
+
+import threading
+from typing import Any, List, Optional
+
+import numpy as np
+
+# Prefix of the answer text returned when the LLM call fails
+ERROR_ANSWER_PREFIX = "Error generating answer"
+
+
+def should_cache_answer(answer: Any) -> bool:
+    """Failed LLM calls and guardrail rejections (confidence 0) are never cached"""
+    return answer.confidence > 0 and not answer.answer.startswith(ERROR_ANSWER_PREFIX)
+
+
+class SemanticAnswerCache:
+    """
+    Per-document cache of answered questions, matched by embedding similarity.
+    Paraphrased questions reuse a previous answer instead of calling the LLM again.
+    """
+    
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._embeddings: Optional[np.ndarray] = None
+        self._answers: List[Any] = []
+        self._lock = threading.Lock()
+    
+    def lookup(self, query_embedding: np.ndarray) -> Optional[Any]:
+        """Return the cached answer for the most similar past question, if close enough"""
+        with self._lock:
+            if self._embeddings is None:
+                return None
+            # Embeddings are L2-normalized, so the dot product is cosine similarity
+            similarities = self._embeddings @ query_embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] > self.threshold:
+                return self._answers[best]
+        return None
+    
+    def add(self, query_embedding: np.ndarray, answer: Any) -> None:
+        """Remember an answer, evicting the oldest entries (FIFO) when full"""
+        with self._lock:
+            row = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+            if self._embeddings is None:
+                self._embeddings = row
+            else:
+                self._embeddings = np.vstack([self._embeddings, row])
+            self._answers.append(answer)
+            
+            overflow = len(self._answers) - self.max_entries
+            if overflow > 0:
+                self._embeddings = self._embeddings[overflow:]
+                del self._answers[:overflow]
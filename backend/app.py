@@ -5,36 +5,115 @@ Advanced RAG system with guardrails, confidence scoring, and structured extracti
 
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Iterable
 import uvicorn
 import os
+import asyncio
 import json
 import re
+import hashlib
+import functools
+import threading
+import sqlite3
 from datetime import datetime
 from pathlib import Path
 
 # Document processing
 import PyPDF2
 import docx
-from io import BytesIO
+from io import BytesIO, StringIO
+
+try:
+    import orjson  # Rust JSON parser/serializer, faster than the stdlib json module
+except ImportError:
+    orjson = None
+json_loads = orjson.loads if orjson is not None else json.loads
+
+try:
+    import pypdfium2  # PDFium-backed reader, much faster text extraction than PyPDF2
+except ImportError:
+    pypdfium2 = None
+# Which library extracted PDF text; part of the stored-content key since outputs differ
+PDF_EXTRACTOR = "pypdfium2" if pypdfium2 is not None else "PyPDF2"
 
 # ML/AI components
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import anthropic
 
+from answer_cache import ERROR_ANSWER_PREFIX, SemanticAnswerCache, should_cache_answer
+from chunking import intelligent_chunk
+from llm import LLMResponseCache, LLMService
+from storage import DocumentRepository
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    # Without numba the JIT helpers run as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+try:
+    import hnswlib  # Approximate nearest-neighbour graph index for large documents
+except ImportError:
+    hnswlib = None
+
+try:
+    import faiss  # IVF index for large documents when hnswlib is unavailable
+except ImportError:
+    faiss = None
+
 # Environment setup
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
+QUERY_CACHE_PATH = UPLOAD_DIR / ".query_cache.sqlite3"
+QUERY_CACHE_MAX_ENTRIES = 100_000
+LLM_CACHE_PATH = UPLOAD_DIR / ".llm_cache.sqlite3"
+LLM_CACHE_MAX_ENTRIES = 10_000
+DOCUMENT_DB_PATH = UPLOAD_DIR / "documents.sqlite3"
+LLM_MODEL = os.getenv("LLM_MODEL", "claude-sonnet-4-20250514")
+LLM_MAX_CONCURRENCY = 8
 
 # Initialize models
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# "onnx" runs the encoder through ONNX Runtime with an INT8-quantized export (CPU)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+if EMBEDDING_BACKEND == "onnx":
+    embedding_model = SentenceTransformer(
+        EMBEDDING_MODEL_NAME,
+        backend="onnx",
+        model_kwargs={"file_name": EMBEDDING_ONNX_FILE},
+    )
+else:
+    # Torch's default thread count is usually right; TORCH_NUM_THREADS lets deployments
+    # split CPUs between Uvicorn workers instead of oversubscribing them
+    if os.getenv("TORCH_NUM_THREADS"):
+        torch.set_num_threads(int(os.environ["TORCH_NUM_THREADS"]))
+    embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=EMBEDDING_DEVICE)
+    if EMBEDDING_DEVICE == "cuda":
+        # FP16 halves memory bandwidth and uses tensor cores on GPU
+        embedding_model.half()
+# Identifies the encoder in on-disk caches so vectors from different backends never mix
+EMBEDDING_CACHE_KEY = f"{EMBEDDING_MODEL_NAME}:{EMBEDDING_ONNX_FILE}" if EMBEDDING_BACKEND == "onnx" else EMBEDDING_MODEL_NAME
 client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY) if ANTHROPIC_API_KEY else None
 
-app = FastAPI(title="Ultra Doc-Intelligence API", version="1.0.0")
+app = FastAPI(
+    title="Ultra Doc-Intelligence API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
+)
 
 # CORS middleware
 app.add_middleware(
@@ -45,7 +124,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage (use database in production)
+# Per-worker cache of loaded documents; DocumentRepository is the shared source of truth
 document_store = {}
 
 # Pydantic models
@@ -77,6 +156,152 @@ class StructuredData(BaseModel):
     confidence: float = 0.0
 
 
+# Phrases that signal an uncertain answer, matched in a single pass
+UNCERTAINTY_PHRASES = ['not sure', 'unclear', 'cannot determine', 'not found', 'unknown']
+UNCERTAINTY_PATTERN = re.compile("|".join(re.escape(phrase) for phrase in UNCERTAINTY_PHRASES))
+
+
+def hash_tokens(words: Iterable[str]) -> np.ndarray:
+    """Map words to a sorted array of unique int64 token ids"""
+    return np.unique(np.fromiter((hash(word) for word in words), dtype=np.int64))
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _sorted_intersection_count(a: np.ndarray, b: np.ndarray) -> int:
+        """Count common elements of two sorted unique arrays with a linear merge"""
+        i = j = count = 0
+        while i < a.shape[0] and j < b.shape[0]:
+            if a[i] == b[j]:
+                count += 1
+                i += 1
+                j += 1
+            elif a[i] < b[j]:
+                i += 1
+            else:
+                j += 1
+        return count
+else:
+    def _sorted_intersection_count(a: np.ndarray, b: np.ndarray) -> int:
+        """Count common elements of two unique arrays (vectorized; an interpreted merge loop is slow)"""
+        return np.intersect1d(a, b, assume_unique=True).size
+
+
+@njit(cache=True)
+def _confidence_score(
+    similarities: np.ndarray,
+    answer_length: int,
+    answer_tokens: np.ndarray,
+    context_tokens: np.ndarray,
+    has_uncertainty: bool
+) -> float:
+    """Weighted sum of the four confidence factors"""
+    # Factor 1: Average similarity score
+    avg_similarity = similarities.mean() if similarities.shape[0] > 0 else 0.0
+    similarity_score = avg_similarity * 0.4
+    
+    # Factor 2: Answer completeness (penalize very short answers)
+    completeness_score = min(answer_length / 20, 1.0) * 0.2
+    
+    # Factor 3: Context overlap
+    overlap = _sorted_intersection_count(answer_tokens, context_tokens) / max(answer_tokens.shape[0], 1)
+    overlap_score = overlap * 0.2
+    
+    # Factor 4: Uncertainty detection (penalize uncertain language)
+    uncertainty_score = 0.0 if has_uncertainty else 0.2
+    
+    return similarity_score + completeness_score + overlap_score + uncertainty_score
+
+
+if NUMBA_AVAILABLE:
+    # Compile (or load from the on-disk cache) at startup, not on a worker's first /ask
+    _confidence_score(np.zeros(1), 1, np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64), False)
+
+
+class QueryEmbeddingStore:
+    """
+    SQLite-backed store of query embeddings that survives restarts.
+    Holds at most max_entries rows; the oldest inserts are pruned first.
+    """
+    
+    def __init__(self, path: Path, max_entries: int):
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, embedding BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._conn.execute("SELECT embedding FROM embeddings WHERE key = ?", (key,)).fetchone()
+        # frombuffer over bytes is read-only, so the array is safe to share
+        return np.frombuffer(row[0], dtype=np.float32) if row else None
+    
+    def set(self, key: str, embedding: np.ndarray) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, embedding) VALUES (?, ?)",
+                    (key, embedding.astype(np.float32).tobytes()),
+                )
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid <= (SELECT MAX(rowid) FROM embeddings) - ?",
+                    (self.max_entries,),
+                )
+
+
+query_embedding_store = QueryEmbeddingStore(QUERY_CACHE_PATH, QUERY_CACHE_MAX_ENTRIES)
+
+
+@functools.lru_cache(maxsize=10_000)
+def _cached_query_embedding(query: str) -> np.ndarray:
+    """
+    Embed a normalized query, memoized in memory and on disk.
+    On-disk entries are keyed by a hash of (model name, query) so they survive restarts.
+    """
+    key = hashlib.blake2b(f"{EMBEDDING_CACHE_KEY}\0{query}".encode('utf-8'), digest_size=16).hexdigest()
+    embedding = query_embedding_store.get(key)
+    if embedding is None:
+        embedding = embedding_model.encode(
+            [query], normalize_embeddings=True, show_progress_bar=False
+        )[0].astype(np.float32)
+        query_embedding_store.set(key, embedding)
+        # Cached arrays are shared between callers, so keep them read-only
+        embedding.setflags(write=False)
+    return embedding
+
+
+llm_cache = LLMResponseCache(LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES)
+llm_service = LLMService(client, LLM_MODEL, llm_cache, max_concurrency=LLM_MAX_CONCURRENCY)
+
+
+# Static instructions go first as a system message so every request shares the same
+# prompt prefix, which provider-side prompt caching can reuse across calls
+ANSWER_SYSTEM_PROMPT = """Based ONLY on the document excerpts provided by the user, answer the question.
+If the information is not in the excerpts, say "Information not found in document."
+Provide a direct, concise answer based only on the information in the excerpts."""
+
+EXTRACTION_SYSTEM_PROMPT = """Extract the following logistics information from the document provided by the user.
+Return ONLY a JSON object with these exact fields. Use null if information is not found.
+
+Fields to extract:
+- shipment_id: string
+- shipper: string (company name)
+- consignee: string (company name)
+- pickup_datetime: string (ISO format if possible)
+- delivery_datetime: string (ISO format if possible)
+- equipment_type: string (e.g., "53' Dry Van", "Flatbed")
+- mode: string (e.g., "Truckload", "LTL")
+- rate: string (numeric value)
+- currency: string (e.g., "USD")
+- weight: string (with units)
+- carrier_name: string
+
+Return ONLY valid JSON, no other text."""
+
+
 class DocumentProcessor:
     """Advanced document processing with intelligent chunking"""
     
@@ -84,12 +309,33 @@ class DocumentProcessor:
     def extract_text(file_bytes: bytes, filename: str) -> str:
         """Extract text from PDF, DOCX, or TXT"""
         try:
+            # Stream page/paragraph text into one buffer instead of building a list first
+            buf = StringIO()
             if filename.endswith('.pdf'):
-                pdf_reader = PyPDF2.PdfReader(BytesIO(file_bytes))
-                text = "\n".join([page.extract_text() for page in pdf_reader.pages])
+                if pypdfium2 is not None:
+                    pdf = pypdfium2.PdfDocument(file_bytes)
+                    try:
+                        for page in pdf:
+                            textpage = page.get_textpage()
+                            # PDFium uses \r\n line breaks; normalize so paragraph splitting matches PyPDF2
+                            buf.write(textpage.get_text_range().replace('\r\n', '\n'))
+                            buf.write('\n')
+                            textpage.close()
+                            page.close()
+                    finally:
+                        pdf.close()
+                else:
+                    pdf_reader = PyPDF2.PdfReader(BytesIO(file_bytes))
+                    for page in pdf_reader.pages:
+                        buf.write(page.extract_text() or '')
+                        buf.write('\n')
+                text = buf.getvalue()
             elif filename.endswith('.docx'):
                 doc = docx.Document(BytesIO(file_bytes))
-                text = "\n".join([para.text for para in doc.paragraphs])
+                for para in doc.paragraphs:
+                    buf.write(para.text)
+                    buf.write('\n')
+                text = buf.getvalue()
             elif filename.endswith('.txt'):
                 text = file_bytes.decode('utf-8')
             else:
@@ -98,43 +344,8 @@ class DocumentProcessor:
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Error processing document: {str(e)}")
     
-    @staticmethod
-    def intelligent_chunk(text: str, chunk_size: int = 500, overlap: int = 100) -> List[str]:
-        """
-        Intelligent chunking strategy:
-        - Respects paragraph boundaries
-        - Maintains semantic coherence
-        - Includes overlap for context preservation
-        """
-        # Split by double newlines (paragraphs)
-        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-        
-        chunks = []
-        current_chunk = ""
-        
-        for para in paragraphs:
-            # If adding this paragraph exceeds chunk_size and we have content
-            if len(current_chunk) + len(para) > chunk_size and current_chunk:
-                chunks.append(current_chunk.strip())
-                # Include overlap from previous chunk
-                words = current_chunk.split()
-                overlap_text = " ".join(words[-overlap//5:]) if len(words) > overlap//5 else ""
-                current_chunk = overlap_text + " " + para
-            else:
-                current_chunk += "\n\n" + para if current_chunk else para
-        
-        # Add final chunk
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
-        # Fallback: if no chunks created, use simple splitting
-        if not chunks:
-            words = text.split()
-            for i in range(0, len(words), chunk_size - overlap):
-                chunk = " ".join(words[i:i + chunk_size])
-                chunks.append(chunk)
-        
-        return chunks
+    # Paragraph-aware chunking lives in chunking.py so it can be tested without the model
+    intelligent_chunk = staticmethod(intelligent_chunk)
 
 
 class RAGEngine:
@@ -144,26 +355,144 @@ class RAGEngine:
         self.min_similarity_threshold = 0.25  # Guardrail threshold
         self.low_confidence_threshold = 0.4
         self.high_confidence_threshold = 0.7
+        self.ivf_min_chunks = 10_000  # Use a FAISS IVF index above this size
+        self.ivf_nprobe = 16
+        self.hnsw_min_chunks = 10_000  # Prefer an HNSW graph index above this size
+        self.hnsw_ef_construction = 200
+        self.hnsw_m = 16
+        self.hnsw_ef = 64
     
     def create_embeddings(self, chunks: List[str]) -> np.ndarray:
-        """Create embeddings for document chunks"""
-        return embedding_model.encode(chunks)
+        """
+        Create L2-normalized embeddings for document chunks.
+        encode() already batches chunks sorted by length to minimize padding.
+        """
+        embeddings = embedding_model.encode(
+            chunks,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        # Contiguous float32 rows keep retrieval a single BLAS matrix-vector product
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+    
+    def build_index(self, embeddings: np.ndarray) -> Optional[Any]:
+        """
+        Build a vector index for a large document:
+        - HNSW graph (hnswlib), giving sub-linear search
+        - FAISS IVF index over float16 vectors when hnswlib is unavailable
+        Returns None for smaller documents (or when neither library is installed);
+        NumPy retrieval then searches the shared memory-mapped embeddings directly.
+        """
+        if len(embeddings) == 0:
+            return None
+        
+        dim = embeddings.shape[1]
+        if hnswlib is not None and len(embeddings) >= self.hnsw_min_chunks:
+            index = hnswlib.Index(space='cosine', dim=dim)
+            index.init_index(
+                max_elements=len(embeddings),
+                ef_construction=self.hnsw_ef_construction,
+                M=self.hnsw_m,
+            )
+            index.add_items(embeddings, np.arange(len(embeddings)))
+            index.set_ef(self.hnsw_ef)
+            return index
+        
+        if faiss is None or len(embeddings) < self.ivf_min_chunks:
+            return None
+        
+        nlist = int(np.sqrt(len(embeddings)))
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFScalarQuantizer(
+            quantizer, dim, nlist, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(embeddings)
+        index.add(embeddings)
+        index.nprobe = self.ivf_nprobe
+        return index
+    
+    def load_index(self, path: Path, dim: int, n_chunks: int) -> Optional[Any]:
+        """
+        Load an index persisted by DocumentRepository, or None if its library is unavailable.
+        FAISS inverted lists are memory-mapped so workers share one copy.
+        """
+        if path.suffix == ".hnsw":
+            if hnswlib is None:
+                return None
+            index = hnswlib.Index(space='cosine', dim=dim)
+            index.load_index(str(path), max_elements=n_chunks)
+            index.set_ef(self.hnsw_ef)
+            return index
+        if faiss is None:
+            return None
+        index = faiss.read_index(str(path), faiss.IO_FLAG_MMAP)
+        index.nprobe = self.ivf_nprobe
+        return index
+    
+    def create_chunk_tokens(self, chunks: List[str]) -> List[np.ndarray]:
+        """Tokenize chunks once at ingestion into sorted token ids for the confidence overlap factor"""
+        return [hash_tokens(chunk.lower().split()) for chunk in chunks]
+    
+    def create_chunk_ids(self, chunks: List[str]) -> List[str]:
+        """Content-hash IDs so a chunk always renders identically in prompts"""
+        return [hashlib.sha256(chunk.encode('utf-8')).hexdigest()[:16] for chunk in chunks]
+    
+    def _encode_query(self, query: str) -> np.ndarray:
+        """Embed a query, reusing cached embeddings for repeated questions"""
+        return _cached_query_embedding(query.strip().lower())
+    
+    def retrieve_relevant_indices(
+        self, 
+        query: str, 
+        embeddings: np.ndarray, 
+        top_k: int = 3,
+        index: Optional[Any] = None
+    ) -> tuple[List[int], List[float]]:
+        """Retrieve indices of the most relevant chunks with similarity scores"""
+        query_embedding = self._encode_query(query)
+        
+        if hnswlib is not None and isinstance(index, hnswlib.Index):
+            k = min(top_k, index.get_current_count())
+            if k == 0:
+                return [], []
+            labels, distances = index.knn_query(query_embedding, k=k)
+            # Cosine space returns distances (1 - similarity)
+            return labels[0].tolist(), [float(1.0 - distance) for distance in distances[0]]
+        
+        if index is not None:
+            k = min(top_k, index.ntotal)
+            if k == 0:
+                return [], []
+            scores, ids = index.search(query_embedding.reshape(1, -1), k)
+            found = ids[0] >= 0  # IVF may return fewer than k hits
+            return ids[0][found].tolist(), [float(score) for score in scores[0][found]]
+        
+        # Both sides are L2-normalized, so cosine similarity is a plain dot product
+        similarities = embeddings @ query_embedding
+        
+        # Get top-k indices: O(N) partition, then sort only the k winners
+        k = min(top_k, len(similarities))
+        if k == 0:
+            return [], []
+        top_indices = np.argpartition(-similarities, k - 1)[:k]
+        top_indices = top_indices[np.argsort(-similarities[top_indices])]
+        retrieved_scores = [float(similarities[i]) for i in top_indices]
+        
+        return top_indices.tolist(), retrieved_scores
     
     def retrieve_relevant_chunks(
         self, 
         query: str, 
         chunks: List[str], 
         embeddings: np.ndarray, 
-        top_k: int = 3
+        top_k: int = 3,
+        index: Optional[Any] = None
     ) -> tuple[List[str], List[float]]:
         """Retrieve most relevant chunks with similarity scores"""
-        query_embedding = embedding_model.encode([query])
-        similarities = cosine_similarity(query_embedding, embeddings)[0]
-        
-        # Get top-k indices
-        top_indices = np.argsort(similarities)[::-1][:top_k]
+        top_indices, retrieved_scores = self.retrieve_relevant_indices(query, embeddings, top_k, index)
         retrieved_chunks = [chunks[i] for i in top_indices]
-        retrieved_scores = [float(similarities[i]) for i in top_indices]
         
         return retrieved_chunks, retrieved_scores
     
@@ -171,7 +500,7 @@ class RAGEngine:
         self, 
         similarities: List[float], 
         answer: str, 
-        context: str
+        context_tokens: np.ndarray
     ) -> tuple[float, str]:
         """
         Multi-factor confidence scoring:
@@ -180,26 +509,18 @@ class RAGEngine:
         3. Context overlap (20%)
         4. Uncertainty detection (20%)
         """
-        # Factor 1: Average similarity score
-        avg_similarity = np.mean(similarities) if similarities else 0.0
-        similarity_score = avg_similarity * 0.4
+        # Tokenization stays in Python; the arithmetic and token intersection are JIT-compiled
+        answer_lower = answer.lower()
+        answer_tokens = hash_tokens(answer_lower.split())
+        has_uncertainty = UNCERTAINTY_PATTERN.search(answer_lower) is not None
         
-        # Factor 2: Answer completeness (penalize very short answers)
-        answer_length = len(answer.split())
-        completeness_score = min(answer_length / 20, 1.0) * 0.2
-        
-        # Factor 3: Context overlap
-        answer_words = set(answer.lower().split())
-        context_words = set(context.lower().split())
-        overlap = len(answer_words & context_words) / max(len(answer_words), 1)
-        overlap_score = overlap * 0.2
-        
-        # Factor 4: Uncertainty detection (penalize uncertain language)
-        uncertainty_phrases = ['not sure', 'unclear', 'cannot determine', 'not found', 'unknown']
-        has_uncertainty = any(phrase in answer.lower() for phrase in uncertainty_phrases)
-        uncertainty_score = 0.0 if has_uncertainty else 0.2
-        
-        total_confidence = similarity_score + completeness_score + overlap_score + uncertainty_score
+        total_confidence = float(_confidence_score(
+            np.asarray(similarities, dtype=np.float64),
+            len(answer.split()),
+            answer_tokens,
+            context_tokens,
+            has_uncertainty
+        ))
         
         # Generate reasoning
         if total_confidence >= self.high_confidence_threshold:
@@ -232,45 +553,66 @@ class RAGEngine:
         
         return None  # No guardrail triggered
     
-    def answer_question(
+    async def answer_question(
         self, 
         question: str, 
         chunks: List[str], 
-        embeddings: np.ndarray
+        embeddings: np.ndarray,
+        chunk_tokens: Optional[List[np.ndarray]] = None,
+        chunk_ids: Optional[List[str]] = None,
+        index: Optional[Any] = None
     ) -> Answer:
         """Main RAG pipeline with guardrails"""
-        # Retrieve relevant chunks
-        retrieved_chunks, similarities = self.retrieve_relevant_chunks(
-            question, chunks, embeddings, top_k=3
+        # Retrieve relevant chunks (query encoding and search run off the event loop)
+        top_indices, similarities = await asyncio.to_thread(
+            self.retrieve_relevant_indices, question, embeddings, 3, index
+        )
+        retrieved_chunks = [chunks[i] for i in top_indices]
+        
+        # Similarity guardrail runs before the LLM so out-of-scope questions cost nothing
+        guardrail_message = self.apply_guardrails(similarities, confidence=1.0)
+        if guardrail_message:
+            return Answer(
+                answer=guardrail_message,
+                sources=retrieved_chunks,
+                confidence=0.0,
+                reasoning="Guardrail triggered"
+            )
+        
+        if chunk_tokens is None:
+            chunk_tokens = self.create_chunk_tokens(chunks)
+        context_tokens = (
+            np.unique(np.concatenate([chunk_tokens[i] for i in top_indices]))
+            if top_indices else np.empty(0, dtype=np.int64)
         )
         
-        # Combine context
-        context = "\n\n---\n\n".join(retrieved_chunks)
+        # Combine context in chunk-id order (not relevance order) so questions that
+        # retrieve the same chunks produce identical prompt prefixes for LLM prefix caching
+        if chunk_ids is None:
+            chunk_ids = self.create_chunk_ids(chunks)
+        prompt_order = sorted(top_indices, key=lambda i: chunk_ids[i])
+        context = "\n\n---\n\n".join(
+            f"<chunk_id:{chunk_ids[i]}>\n{chunks[i]}" for i in prompt_order
+        )
         
         # Generate answer using Claude
         if client:
             try:
-                prompt = f"""Based ONLY on the following document excerpts, answer the question.
-If the information is not in the excerpts, say "Information not found in document."
-
-Document excerpts:
-{context}
-
-Question: {question}
-
-Provide a direct, concise answer based only on the information above."""
-
-                message = client.chat.completions.create(model="gpt-4o-mini",messages=[{"role": "user", "content": prompt}],max_tokens=1000)
-                answer_text = message.choices[0].message.content
+                # Excerpts precede the question so shared chunks stay in the cached prefix
+                answer_text = await llm_service.complete(
+                    f"Question: {question}",
+                    system=ANSWER_SYSTEM_PROMPT,
+                    cached_context=f"Document excerpts:\n{context}",
+                )
             except Exception as e:
-                answer_text = f"Error generating answer: {str(e)}"
+                answer_text = f"{ERROR_ANSWER_PREFIX}: {str(e)}"
         else:
             # Fallback: simple extraction
             answer_text = f"Based on the retrieved context: {retrieved_chunks[0][:200]}..."
         
-        # Calculate confidence
-        confidence, reasoning = self.calculate_confidence(
-            similarities, answer_text, context
+        # Calculate confidence (off the event loop, like retrieval)
+        confidence, reasoning = await asyncio.to_thread(
+            self.calculate_confidence, similarities, answer_text, context_tokens
         )
         
         # Apply guardrails
@@ -292,41 +634,22 @@ class StructuredExtractor:
     """Extract structured shipment data using LLM"""
     
     @staticmethod
-    def extract_structured_data(text: str) -> StructuredData:
+    async def extract_structured_data(text: str) -> StructuredData:
         """Extract structured logistics data from document"""
         if not client:
             return StructuredData(confidence=0.0)
         
         try:
-            prompt = f"""Extract the following logistics information from the document. 
-Return ONLY a JSON object with these exact fields. Use null if information is not found.
-
-Fields to extract:
-- shipment_id: string
-- shipper: string (company name)
-- consignee: string (company name)
-- pickup_datetime: string (ISO format if possible)
-- delivery_datetime: string (ISO format if possible)
-- equipment_type: string (e.g., "53' Dry Van", "Flatbed")
-- mode: string (e.g., "Truckload", "LTL")
-- rate: string (numeric value)
-- currency: string (e.g., "USD")
-- weight: string (with units)
-- carrier_name: string
+            prompt = f"""Document:
+{text[:4000]}"""
 
-Document:
-{text[:4000]}
-
-Return ONLY valid JSON, no other text."""
-
-            message = client.chat.completions.create(model="gpt-4o-mini",messages=[{"role": "user", "content": prompt}],max_tokens=1000)
-            
-            response_text = message.choices[0].message.content
+            response_text = await llm_service.complete(prompt, system=EXTRACTION_SYSTEM_PROMPT)
             
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                data = json.loads(json_match.group())
+            # Extract JSON from response: slice from the first '{' to the last '}'
+            start = response_text.find('{')
+            end = response_text.rfind('}')
+            if start != -1 and end > start:
+                data = json_loads(response_text[start:end + 1])
                 # Calculate confidence based on how many fields found
                 non_null_count = sum(1 for v in data.values() if v is not None)
                 confidence = non_null_count / 11  # 11 fields total
@@ -342,6 +665,48 @@ Return ONLY valid JSON, no other text."""
 # Initialize engines
 rag_engine = RAGEngine()
 extractor = StructuredExtractor()
+document_repository = DocumentRepository(DOCUMENT_DB_PATH, UPLOAD_DIR)
+
+
+def build_document_entry(
+    filename: str,
+    text: str,
+    chunks: List[str],
+    embeddings: np.ndarray,
+    uploaded_at: str,
+    index: Optional[Any] = None,
+    index_path: Optional[Path] = None
+) -> Dict[str, Any]:
+    """Derive the per-worker retrieval state (index, word sets, caches) for a document"""
+    if index is None and index_path is not None:
+        index = rag_engine.load_index(index_path, embeddings.shape[1], len(chunks))
+    if index is None:
+        index = rag_engine.build_index(embeddings)
+    return {
+        "filename": filename,
+        "text": text,
+        "chunks": chunks,
+        "embeddings": embeddings,
+        "index": index,
+        "chunk_tokens": rag_engine.create_chunk_tokens(chunks),
+        "chunk_ids": rag_engine.create_chunk_ids(chunks),
+        "answer_cache": SemanticAnswerCache(),
+        "uploaded_at": uploaded_at
+    }
+
+
+async def get_document(doc_id: str) -> Dict[str, Any]:
+    """Return a document, loading it from the shared repository if another worker stored it"""
+    doc = document_store.get(doc_id)
+    if doc is not None:
+        return doc
+    
+    stored = await asyncio.to_thread(document_repository.load, doc_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    doc = await asyncio.to_thread(build_document_entry, **stored)
+    return document_store.setdefault(doc_id, doc)
 
 
 # API Endpoints
@@ -352,26 +717,43 @@ async def upload_document(file: UploadFile = File(...)):
         # Read file
         file_bytes = await file.read()
         
-        # Extract text
-        text = DocumentProcessor.extract_text(file_bytes, file.filename)
-        
-        # Intelligent chunking
-        chunks = DocumentProcessor.intelligent_chunk(text)
-        
-        # Create embeddings
-        embeddings = rag_engine.create_embeddings(chunks)
+        # Reuse processed results for documents that were uploaded before
+        # Extraction depends on the file extension (and PDF library), so both are part of the key
+        suffix = Path(file.filename).suffix.lower()
+        extractor_key = PDF_EXTRACTOR if suffix == '.pdf' else ''
+        file_key = f"{EMBEDDING_CACHE_KEY}\0{suffix}\0{extractor_key}\0".encode('utf-8')
+        content_hash = hashlib.sha256(file_key + file_bytes).hexdigest()
+        stored = await asyncio.to_thread(document_repository.load_content, content_hash)
+        if stored is not None:
+            text, chunks, embeddings = stored["text"], stored["chunks"], stored["embeddings"]
+            index, index_path = None, stored["index_path"]
+        else:
+            # Extract text (CPU-bound work runs off the event loop)
+            text = await asyncio.to_thread(DocumentProcessor.extract_text, file_bytes, file.filename)
+            
+            # Intelligent chunking
+            chunks = await asyncio.to_thread(DocumentProcessor.intelligent_chunk, text)
+            
+            # Create embeddings
+            embeddings = await asyncio.to_thread(rag_engine.create_embeddings, chunks)
+            
+            # Build the vector index, then persist everything for all workers
+            # and keep the memory-mapped copy
+            index, index_path = await asyncio.to_thread(rag_engine.build_index, embeddings), None
+            embeddings = await asyncio.to_thread(
+                document_repository.save_content, content_hash, text, chunks, embeddings, index
+            )
         
-        # Generate document ID
-        doc_id = f"doc_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        # Generate document ID (random suffix keeps concurrent workers from colliding)
+        doc_id = f"doc_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.urandom(3).hex()}"
+        uploaded_at = datetime.now().isoformat()
         
-        # Store in memory
-        document_store[doc_id] = {
-            "filename": file.filename,
-            "text": text,
-            "chunks": chunks,
-            "embeddings": embeddings,
-            "uploaded_at": datetime.now().isoformat()
-        }
+        await asyncio.to_thread(
+            document_repository.add_document, doc_id, content_hash, file.filename, uploaded_at
+        )
+        document_store[doc_id] = await asyncio.to_thread(
+            build_document_entry, file.filename, text, chunks, embeddings, uploaded_at, index, index_path
+        )
         
         return {
             "doc_id": doc_id,
@@ -387,28 +769,36 @@ async def upload_document(file: UploadFile = File(...)):
 @app.post("/ask", response_model=Answer)
 async def ask_question(request: QuestionRequest):
     """Ask a question about an uploaded document"""
-    if request.doc_id not in document_store:
-        raise HTTPException(status_code=404, detail="Document not found")
+    doc = await get_document(request.doc_id)
     
-    doc = document_store[request.doc_id]
+    # Serve paraphrases of previously answered questions from the semantic cache
+    query_embedding = await asyncio.to_thread(rag_engine._encode_query, request.question)
+    cached_answer = doc["answer_cache"].lookup(query_embedding)
+    if cached_answer is not None:
+        return cached_answer
     
-    answer = rag_engine.answer_question(
+    # Retrieval runs in a worker thread; the LLM call waits for a slot on the event loop
+    answer = await rag_engine.answer_question(
         request.question,
         doc["chunks"],
-        doc["embeddings"]
+        doc["embeddings"],
+        doc["chunk_tokens"],
+        doc["chunk_ids"],
+        doc["index"]
     )
     
+    # Don't cache failed LLM calls or guardrail rejections
+    if should_cache_answer(answer):
+        doc["answer_cache"].add(query_embedding, answer)
+    
     return answer
 
 
 @app.post("/extract", response_model=StructuredData)
 async def extract_structured(request: ExtractionRequest):
     """Extract structured shipment data from document"""
-    if request.doc_id not in document_store:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    doc = document_store[request.doc_id]
-    structured_data = extractor.extract_structured_data(doc["text"])
+    doc = await get_document(request.doc_id)
+    structured_data = await extractor.extract_structured_data(doc["text"])
     
     return structured_data
 
@@ -416,26 +806,18 @@ async def extract_structured(request: ExtractionRequest):
 @app.get("/documents")
 async def list_documents():
     """List all uploaded documents"""
-    return {
-        "documents": [
-            {
-                "doc_id": doc_id,
-                "filename": doc["filename"],
-                "uploaded_at": doc["uploaded_at"],
-                "chunks": len(doc["chunks"])
-            }
-            for doc_id, doc in document_store.items()
-        ]
-    }
+    documents = await asyncio.to_thread(document_repository.list_documents)
+    return {"documents": documents}
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    documents_loaded = await asyncio.to_thread(document_repository.count_documents)
     return {
         "status": "healthy",
         "anthropic_available": client is not None,
-        "documents_loaded": len(document_store)
+        "documents_loaded": documents_loaded
     }
 
 
@@ -0,0 +1,54 @@
+"""
+Text chunking for Ultra Doc-Intelligence
+"""
+
+from typing import List
+
+
+def intelligent_chunk(text: str, chunk_size: int = 500, overlap: int = 100) -> List[str]:
+    """
+    Intelligent chunking strategy:
+    - Respects paragraph boundaries
+    - Maintains semantic coherence
+    - Includes overlap for context preservation
+    """
+    # Split by double newlines (paragraphs)
+    paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+    
+    chunks = []
+    # Current chunk is "\n\n".join(buf); track its length and per-piece tokens
+    # incrementally so each paragraph is only concatenated and split once
+    buf: List[str] = []
+    buf_words: List[List[str]] = []
+    buf_len = 0
+    
+    for para in paragraphs:
+        para_words = para.split()
+        # If adding this paragraph exceeds chunk_size and we have content
+        if buf_len + len(para) > chunk_size and buf:
+            chunks.append("\n\n".join(buf).strip())
+            # Include overlap from previous chunk
+            words = [word for piece in buf_words for word in piece]
+            tail = words[-overlap//5:] if len(words) > overlap//5 else []
+            piece = " ".join(tail) + " " + para
+            buf, buf_words = [piece], [tail + para_words]
+            buf_len = len(piece)
+        else:
+            if buf:
+                buf_len += 2  # "\n\n" separator
+            buf.append(para)
+            buf_words.append(para_words)
+            buf_len += len(para)
+    
+    # Add final chunk
+    if buf:
+        chunks.append("\n\n".join(buf).strip())
+    
+    # Fallback: if no chunks created, use simple splitting
+    if not chunks:
+        words = text.split()
+        for i in range(0, len(words), chunk_size - overlap):
+            chunk = " ".join(words[i:i + chunk_size])
+            chunks.append(chunk)
+    
+    return chunks
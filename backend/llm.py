@@ -0,0 +1,121 @@
+"""
+LLM access for Ultra Doc-Intelligence
+Response caching, bounded concurrency and coalescing of identical in-flight requests
+"""
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed cache of LLM completions keyed by a hash of (model, prompt).
+    Prompts embed the document text, so entries never go stale for a given key.
+    Holds at most max_entries rows; the oldest inserts are pruned first.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        return hashlib.sha256("\0".join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, response: str) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response) VALUES (?, ?)", (key, response)
+                )
+                self._conn.execute(
+                    "DELETE FROM responses WHERE rowid <= (SELECT MAX(rowid) FROM responses) - ?",
+                    (self.max_entries,),
+                )
+
+
+class LLMService:
+    """
+    Async front end for the synchronous Anthropic client:
+    - Repeated prompts are served from the response cache
+    - Identical prompts already in flight share one request
+    - At most max_concurrency requests run at once; callers wait on the event
+      loop, not in executor threads, so queued calls don't starve other work
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        model: str,
+        cache: LLMResponseCache,
+        max_concurrency: int = 8,
+        max_tokens: int = 1000
+    ):
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.max_tokens = max_tokens
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def complete(self, prompt: str, system: str, cached_context: Optional[str] = None) -> str:
+        """Return the completion for a prompt, calling the LLM at most once per distinct request"""
+        key = LLMResponseCache.make_key(self.model, system, cached_context or "", prompt)
+
+        # The cache is checked inside the task: a finished request has always written
+        # the cache before leaving _inflight, so a later task finds it and never repeats it
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, prompt, system, cached_context))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        # Shielded so one caller disconnecting doesn't cancel the request for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved when every caller has gone away
+
+    async def _fetch(self, key: str, prompt: str, system: str, cached_context: Optional[str]) -> str:
+        # SQLite reads and writes run in worker threads so they never block the event loop
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return cached
+        async with self._semaphore:
+            return await asyncio.to_thread(self._create_and_store, key, prompt, system, cached_context)
+
+    def _create_and_store(self, key: str, prompt: str, system: str, cached_context: Optional[str]) -> str:
+        response_text = self._create(prompt, system, cached_context)
+        self.cache.set(key, response_text)
+        return response_text
+
+    def _create(self, prompt: str, system: str, cached_context: Optional[str]) -> str:
+        # Static system prompt and document context are marked for Anthropic prompt caching;
+        # only the trailing prompt block varies between requests that share a prefix
+        content = []
+        if cached_context:
+            content.append({"type": "text", "text": cached_context, "cache_control": {"type": "ephemeral"}})
+        content.append({"type": "text", "text": prompt})
+        message = self.client.messages.create(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            system=[{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}],
+            messages=[{"role": "user", "content": content}],
+        )
+        return "".join(block.text for block in message.content if block.type == "text")
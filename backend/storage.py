@@ -0,0 +1,198 @@
+"""
+Document storage for Ultra Doc-Intelligence
+SQLite metadata and memory-mapped embeddings shared by every Uvicorn worker
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+
+# On-disk vector index formats, in lookup order
+INDEX_SUFFIXES = (".hnsw", ".faiss")
+
+
+class DocumentRepository:
+    """
+    Documents shared across Uvicorn workers.
+    Processed content (text, chunks, embeddings) is stored once per content hash,
+    so re-uploading the same file reuses it instead of re-embedding. Text and chunks
+    live in SQLite; embeddings are raw float32 files that every worker memory-maps
+    read-only, so they share one copy in the page cache. Vector indexes for large
+    documents are saved next to them (<content_hash>.hnsw or .faiss).
+    """
+    
+    def __init__(self, db_path: Path, embeddings_dir: Path):
+        self.embeddings_dir = embeddings_dir
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS contents (
+                content_hash TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                n_chunks INTEGER NOT NULL,
+                dim INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                content_hash TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                PRIMARY KEY (content_hash, position)
+            );
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                uploaded_at TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+    
+    def _embeddings_path(self, content_hash: str) -> Path:
+        return self.embeddings_dir / f"{content_hash}.emb"
+    
+    def _index_path(self, content_hash: str, suffix: str) -> Path:
+        return self.embeddings_dir / f"{content_hash}{suffix}"
+    
+    def _temp_path(self, path: Path) -> Path:
+        # Written then renamed, so a worker racing on the same content never
+        # truncates a file that another worker already has open or mapped
+        return path.with_suffix(f"{path.suffix}.{os.getpid()}.{threading.get_ident()}.tmp")
+    
+    def _open_embeddings(self, content_hash: str, n_chunks: int, dim: int) -> np.ndarray:
+        if n_chunks == 0:
+            # Empty files cannot be memory-mapped
+            return np.zeros((0, dim), dtype=np.float32)
+        return np.memmap(self._embeddings_path(content_hash), dtype=np.float32, mode='r', shape=(n_chunks, dim))
+    
+    def _load_content(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        # Caller holds self._lock
+        row = self._conn.execute(
+            "SELECT text, n_chunks, dim FROM contents WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+        text, n_chunks, dim = row
+        chunks = [
+            content for (content,) in self._conn.execute(
+                "SELECT content FROM chunks WHERE content_hash = ? ORDER BY position", (content_hash,)
+            )
+        ]
+        index_paths = [self._index_path(content_hash, suffix) for suffix in INDEX_SUFFIXES]
+        return {
+            "text": text,
+            "chunks": chunks,
+            "embeddings": self._open_embeddings(content_hash, n_chunks, dim),
+            "index_path": next((path for path in index_paths if path.exists()), None),
+        }
+    
+    def load_content(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Text, chunks, memory-mapped embeddings and saved index path from a previous upload of the same content"""
+        with self._lock:
+            return self._load_content(content_hash)
+    
+    def save_content(
+        self,
+        content_hash: str,
+        text: str,
+        chunks: List[str],
+        embeddings: np.ndarray,
+        index: Optional[Any] = None
+    ) -> np.ndarray:
+        """
+        Persist processed content and return its embeddings as a read-only memmap.
+        Vector indexes are saved too, since they are expensive to rebuild in every worker.
+        """
+        n_chunks = len(chunks)
+        dim = embeddings.shape[1] if embeddings.ndim == 2 else 0
+        if index is not None:
+            if hnswlib is not None and isinstance(index, hnswlib.Index):
+                index_path = self._index_path(content_hash, ".hnsw")
+                tmp_path = self._temp_path(index_path)
+                index.save_index(str(tmp_path))
+            else:
+                index_path = self._index_path(content_hash, ".faiss")
+                tmp_path = self._temp_path(index_path)
+                faiss.write_index(index, str(tmp_path))
+            os.replace(tmp_path, index_path)
+        if n_chunks:
+            path = self._embeddings_path(content_hash)
+            tmp_path = self._temp_path(path)
+            mapped = np.memmap(tmp_path, dtype=np.float32, mode='w+', shape=(n_chunks, dim))
+            mapped[:] = embeddings
+            mapped.flush()
+            del mapped
+            os.replace(tmp_path, path)
+        
+        # The contents row is committed last so other workers never see partial content
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO chunks (content_hash, position, content) VALUES (?, ?, ?)",
+                    ((content_hash, position, chunk) for position, chunk in enumerate(chunks)),
+                )
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO contents (content_hash, text, n_chunks, dim) VALUES (?, ?, ?, ?)",
+                    (content_hash, text, n_chunks, dim),
+                )
+        return self._open_embeddings(content_hash, n_chunks, dim)
+    
+    def add_document(self, doc_id: str, content_hash: str, filename: str, uploaded_at: str) -> None:
+        """Register an uploaded document pointing at previously saved content"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO documents (doc_id, content_hash, filename, uploaded_at) VALUES (?, ?, ?, ?)",
+                    (doc_id, content_hash, filename, uploaded_at),
+                )
+    
+    def load(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Load a document saved by any worker, or None if it doesn't exist"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, filename, uploaded_at FROM documents WHERE doc_id = ?",
+                (doc_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            content_hash, filename, uploaded_at = row
+            content = self._load_content(content_hash)
+        if content is None:
+            return None
+        return {"filename": filename, "uploaded_at": uploaded_at, **content}
+    
+    def count_documents(self) -> int:
+        """Number of stored documents across all workers"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    
+    def list_documents(self) -> List[Dict[str, Any]]:
+        """Metadata for every stored document"""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT documents.doc_id, documents.filename, documents.uploaded_at, contents.n_chunks
+                FROM documents JOIN contents ON contents.content_hash = documents.content_hash
+                ORDER BY documents.uploaded_at
+                """
+            ).fetchall()
+        return [
+            {"doc_id": doc_id, "filename": filename, "uploaded_at": uploaded_at, "chunks": n_chunks}
+            for doc_id, filename, uploaded_at, n_chunks in rows
+        ]
@@ -0,0 +1,73 @@
+"""
+Unit tests for the semantic answer cache: similarity threshold, FIFO eviction
+and which answers are eligible for caching.
+Run from backend/: python -m unittest test_answer_cache
+"""
+
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from answer_cache import ERROR_ANSWER_PREFIX, SemanticAnswerCache, should_cache_answer
+
+
+def unit(*values: float) -> np.ndarray:
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class SemanticAnswerCacheTest(unittest.TestCase):
+
+    def test_empty_cache_misses(self):
+        self.assertIsNone(SemanticAnswerCache().lookup(unit(1, 0, 0)))
+
+    def test_similar_question_above_threshold_hits(self):
+        cache = SemanticAnswerCache(threshold=0.95)
+        cache.add(unit(1, 0, 0), "rate answer")
+
+        # cos ~= 0.995
+        self.assertEqual(cache.lookup(unit(1, 0.1, 0)), "rate answer")
+
+    def test_question_below_threshold_misses(self):
+        cache = SemanticAnswerCache(threshold=0.95)
+        cache.add(unit(1, 0, 0), "rate answer")
+
+        # cos ~= 0.89
+        self.assertIsNone(cache.lookup(unit(1, 0.5, 0)))
+        self.assertIsNone(cache.lookup(unit(0, 1, 0)))
+
+    def test_best_match_wins(self):
+        cache = SemanticAnswerCache(threshold=0.9)
+        cache.add(unit(1, 0.2, 0), "close")
+        cache.add(unit(1, 0, 0), "exact")
+
+        self.assertEqual(cache.lookup(unit(1, 0, 0)), "exact")
+
+    def test_oldest_entries_are_evicted_first(self):
+        cache = SemanticAnswerCache(max_entries=2)
+        cache.add(unit(1, 0, 0), "first")
+        cache.add(unit(0, 1, 0), "second")
+        cache.add(unit(0, 0, 1), "third")
+
+        self.assertIsNone(cache.lookup(unit(1, 0, 0)))
+        self.assertEqual(cache.lookup(unit(0, 1, 0)), "second")
+        self.assertEqual(cache.lookup(unit(0, 0, 1)), "third")
+
+
+class ShouldCacheAnswerTest(unittest.TestCase):
+
+    def test_confident_answer_is_cached(self):
+        self.assertTrue(should_cache_answer(SimpleNamespace(answer="USD 1,500", confidence=0.82)))
+
+    def test_guardrail_answer_is_not_cached(self):
+        answer = SimpleNamespace(answer="NOT_FOUND: No relevant information found", confidence=0.0)
+        self.assertFalse(should_cache_answer(answer))
+
+    def test_llm_error_is_not_cached(self):
+        answer = SimpleNamespace(answer=f"{ERROR_ANSWER_PREFIX}: timeout", confidence=0.45)
+        self.assertFalse(should_cache_answer(answer))
+
+
+if __name__ == "__main__":
+    unittest.main()
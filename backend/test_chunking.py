@@ -0,0 +1,86 @@
+"""
+Regression tests pinning intelligent_chunk to the original string-concatenation
+implementation it replaced.
+Run from backend/: python -m unittest test_chunking
+"""
+
+import unittest
+from typing import List
+
+from chunking import intelligent_chunk
+
+
+def reference_chunk(text: str, chunk_size: int = 500, overlap: int = 100) -> List[str]:
+    """The original implementation, kept verbatim as the expected behaviour"""
+    paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+
+    chunks = []
+    current_chunk = ""
+
+    for para in paragraphs:
+        if len(current_chunk) + len(para) > chunk_size and current_chunk:
+            chunks.append(current_chunk.strip())
+            words = current_chunk.split()
+            overlap_text = " ".join(words[-overlap//5:]) if len(words) > overlap//5 else ""
+            current_chunk = overlap_text + " " + para
+        else:
+            current_chunk += "\n\n" + para if current_chunk else para
+
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+
+    if not chunks:
+        words = text.split()
+        for i in range(0, len(words), chunk_size - overlap):
+            chunk = " ".join(words[i:i + chunk_size])
+            chunks.append(chunk)
+
+    return chunks
+
+
+BILL_OF_LADING = """BILL OF LADING
+
+Shipment ID: SHP-2024-00172
+Shipper: Acme Manufacturing, 100 Industrial Way, Dayton OH
+
+Consignee: Global Retail Inc, 55 Commerce Blvd, Newark NJ
+Pickup: 2024-03-04 08:00  Delivery: 2024-03-06 14:00
+
+Equipment: 53' Dry Van   Mode: Truckload   Weight: 38,500 lbs
+
+Carrier: Blue Line Freight LLC
+Rate: 2,450.00 USD all-in, including fuel surcharge and detention after two hours"""
+
+LONG_PARAGRAPH = " ".join(f"word{i}" for i in range(200))
+
+CASES = [
+    ("bill_of_lading", BILL_OF_LADING, {}),
+    ("bill_of_lading_small_chunks", BILL_OF_LADING, {"chunk_size": 80, "overlap": 20}),
+    ("overlap_zero", BILL_OF_LADING, {"chunk_size": 80, "overlap": 0}),
+    ("paragraph_longer_than_chunk", f"Intro line\n\n{LONG_PARAGRAPH}\n\nOutro line", {"chunk_size": 100}),
+    ("only_long_paragraphs", f"{LONG_PARAGRAPH}\n\n{LONG_PARAGRAPH}", {"chunk_size": 100, "overlap": 40}),
+    ("blank_and_whitespace_paragraphs", "a b c\n\n   \n\n\n\nd e f\n\n\n  g h  ", {"chunk_size": 5, "overlap": 5}),
+    ("empty", "", {}),
+    ("whitespace_only", " \n\n \n", {}),
+]
+
+
+class IntelligentChunkTest(unittest.TestCase):
+
+    def test_matches_original_implementation(self):
+        for name, text, kwargs in CASES:
+            with self.subTest(name):
+                self.assertEqual(intelligent_chunk(text, **kwargs), reference_chunk(text, **kwargs))
+
+    def test_overlap_zero_repeats_whole_previous_chunk(self):
+        # -0//5 == 0, so words[-0:] keeps every word; pinned so a refactor can't silently change it
+        chunks = intelligent_chunk("aaaa\n\nbbbb\n\ncccc", chunk_size=8, overlap=0)
+        self.assertEqual(chunks, ["aaaa\n\nbbbb", "aaaa bbbb cccc"])
+
+    def test_paragraph_longer_than_chunk_is_kept_whole(self):
+        chunks = intelligent_chunk(f"Intro line\n\n{LONG_PARAGRAPH}", chunk_size=100, overlap=5)
+        self.assertEqual(chunks, ["Intro line", f"line {LONG_PARAGRAPH}"])
+
+
+if __name__ == "__main__":
+    unittest.main()
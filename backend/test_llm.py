@@ -0,0 +1,131 @@
+"""
+Unit tests for the LLM service: response caching, request coalescing,
+error propagation and the concurrency bound. Uses a stub client, no network.
+Run from backend/: python -m unittest test_llm
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from llm import LLMResponseCache, LLMService
+
+
+class StubMessages:
+    """Stands in for client.messages; records calls and tracks concurrency"""
+
+    def __init__(self, delay: float = 0.05, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.calls.append(kwargs)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            prompt = kwargs["messages"][0]["content"][-1]["text"]
+            return SimpleNamespace(content=[SimpleNamespace(type="text", text=f"answer to {prompt}")])
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def make_service(messages: StubMessages, max_concurrency: int = 8) -> LLMService:
+    cache = LLMResponseCache(Path(":memory:"))
+    return LLMService(SimpleNamespace(messages=messages), "test-model", cache, max_concurrency=max_concurrency)
+
+
+class LLMResponseCacheTest(unittest.TestCase):
+
+    def test_oldest_entries_are_pruned_past_max_entries(self):
+        cache = LLMResponseCache(Path(":memory:"), max_entries=3)
+        for i in range(5):
+            cache.set(f"k{i}", f"v{i}")
+
+        self.assertIsNone(cache.get("k0"))
+        self.assertIsNone(cache.get("k1"))
+        self.assertEqual([cache.get(f"k{i}") for i in range(2, 5)], ["v2", "v3", "v4"])
+
+
+class LLMServiceTest(unittest.TestCase):
+
+    def test_identical_concurrent_requests_share_one_call(self):
+        messages = StubMessages()
+        service = make_service(messages)
+
+        async def run():
+            return await asyncio.gather(*(service.complete("Q", system="S") for _ in range(5)))
+
+        results = asyncio.run(run())
+        self.assertEqual(results, ["answer to Q"] * 5)
+        self.assertEqual(len(messages.calls), 1)
+
+    def test_repeated_request_is_served_from_cache(self):
+        messages = StubMessages(delay=0)
+        service = make_service(messages)
+
+        async def run():
+            first = await service.complete("Q", system="S")
+            second = await service.complete("Q", system="S")
+            return first, second
+
+        self.assertEqual(asyncio.run(run()), ("answer to Q", "answer to Q"))
+        self.assertEqual(len(messages.calls), 1)
+
+    def test_error_reaches_every_waiter_and_is_not_cached(self):
+        messages = StubMessages(error=RuntimeError("boom"))
+        service = make_service(messages)
+
+        async def run():
+            return await asyncio.gather(
+                *(service.complete("Q", system="S") for _ in range(3)), return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+        self.assertEqual(len(messages.calls), 1)
+        for result in results:
+            self.assertIsInstance(result, RuntimeError)
+
+        # A later request retries instead of replaying the failure
+        messages.error = None
+        self.assertEqual(asyncio.run(service.complete("Q", system="S")), "answer to Q")
+        self.assertEqual(len(messages.calls), 2)
+
+    def test_distinct_requests_respect_concurrency_limit(self):
+        messages = StubMessages()
+        service = make_service(messages, max_concurrency=2)
+
+        async def run():
+            return await asyncio.gather(*(service.complete(f"Q{i}", system="S") for i in range(6)))
+
+        results = asyncio.run(run())
+        self.assertEqual(results, [f"answer to Q{i}" for i in range(6)])
+        self.assertEqual(len(messages.calls), 6)
+        self.assertLessEqual(messages.max_active, 2)
+
+    def test_cached_context_is_sent_as_cacheable_block(self):
+        messages = StubMessages(delay=0)
+        service = make_service(messages)
+
+        asyncio.run(service.complete("Question: Q", system="S", cached_context="Document excerpts:\nX"))
+
+        call = messages.calls[0]
+        self.assertEqual(call["system"][0]["cache_control"], {"type": "ephemeral"})
+        context_block, prompt_block = call["messages"][0]["content"]
+        self.assertEqual(context_block["cache_control"], {"type": "ephemeral"})
+        self.assertNotIn("cache_control", prompt_block)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Unit tests for DocumentRepository: content-hash deduplication, loading documents
+saved by another worker, empty content and atomic embedding/index writes.
+Run from backend/: python -m unittest test_storage
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+import storage
+from storage import DocumentRepository
+
+
+def make_embeddings(n_chunks: int, dim: int = 8) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((n_chunks, dim)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+class DocumentRepositoryTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.repository = self.open_repository()
+
+    def open_repository(self) -> DocumentRepository:
+        return DocumentRepository(self.dir / "documents.sqlite3", self.dir)
+
+    def test_unknown_content_and_document_return_none(self):
+        self.assertIsNone(self.repository.load_content("missing"))
+        self.assertIsNone(self.repository.load("doc_missing"))
+
+    def test_reupload_reuses_content_by_hash(self):
+        embeddings = make_embeddings(3)
+        self.repository.save_content("hash", "text", ["a", "b", "c"], embeddings)
+        self.repository.add_document("doc_1", "hash", "first.txt", "2024-01-01T00:00:00")
+
+        # A second upload of the same bytes finds the content and only adds a document row
+        stored = self.repository.load_content("hash")
+        self.assertEqual(stored["chunks"], ["a", "b", "c"])
+        np.testing.assert_array_equal(stored["embeddings"], embeddings)
+        self.repository.add_document("doc_2", "hash", "second.txt", "2024-01-02T00:00:00")
+
+        # Saving the same content again is a no-op rather than a duplicate
+        self.repository.save_content("hash", "text", ["a", "b", "c"], embeddings)
+        self.assertEqual(self.repository.count_documents(), 2)
+        self.assertEqual(
+            [(doc["doc_id"], doc["chunks"]) for doc in self.repository.list_documents()],
+            [("doc_1", 3), ("doc_2", 3)],
+        )
+        self.assertEqual(len(list(self.dir.glob("*.emb"))), 1)
+
+    def test_document_saved_by_another_instance_loads(self):
+        embeddings = make_embeddings(4)
+        self.repository.save_content("hash", "full text", ["w", "x", "y", "z"], embeddings)
+        self.repository.add_document("doc_1", "hash", "report.pdf", "2024-01-01T00:00:00")
+
+        # Another worker (or a restarted server) opens its own connection
+        doc = self.open_repository().load("doc_1")
+        self.assertEqual(doc["filename"], "report.pdf")
+        self.assertEqual(doc["uploaded_at"], "2024-01-01T00:00:00")
+        self.assertEqual(doc["text"], "full text")
+        self.assertEqual(doc["chunks"], ["w", "x", "y", "z"])
+        self.assertIsInstance(doc["embeddings"], np.memmap)
+        self.assertFalse(doc["embeddings"].flags.writeable)
+        np.testing.assert_array_equal(doc["embeddings"], embeddings)
+        self.assertIsNone(doc["index_path"])
+
+    def test_empty_content_has_no_embeddings_file(self):
+        returned = self.repository.save_content("hash", "", [], np.zeros((0, 8), dtype=np.float32))
+        self.repository.add_document("doc_1", "hash", "empty.txt", "2024-01-01T00:00:00")
+
+        self.assertEqual(returned.shape, (0, 8))
+        self.assertFalse((self.dir / "hash.emb").exists())
+        doc = self.open_repository().load("doc_1")
+        self.assertEqual(doc["chunks"], [])
+        self.assertEqual(doc["embeddings"].shape, (0, 8))
+
+    def test_embeddings_are_written_to_temp_file_then_renamed(self):
+        with mock.patch.object(storage.os, "replace", wraps=os.replace) as replace:
+            self.repository.save_content("hash", "text", ["a", "b"], make_embeddings(2))
+
+        (src, dst), _ = replace.call_args
+        self.assertEqual(Path(dst), self.dir / "hash.emb")
+        self.assertTrue(str(src).endswith(".tmp"))
+        self.assertEqual(list(self.dir.glob("*.tmp")), [])
+
+    @unittest.skipIf(storage.hnswlib is None, "hnswlib not installed")
+    def test_hnsw_index_is_saved_next_to_embeddings(self):
+        embeddings = make_embeddings(20)
+        index = storage.hnswlib.Index(space='cosine', dim=8)
+        index.init_index(max_elements=20)
+        index.add_items(embeddings, np.arange(20))
+
+        with mock.patch.object(storage.os, "replace", wraps=os.replace) as replace:
+            self.repository.save_content("hash", "text", [str(i) for i in range(20)], embeddings, index)
+
+        renamed = {Path(dst): str(src) for (src, dst), _ in replace.call_args_list}
+        self.assertTrue(renamed[self.dir / "hash.hnsw"].endswith(".tmp"))
+        self.assertEqual(list(self.dir.glob("*.tmp")), [])
+
+        stored = self.open_repository().load_content("hash")
+        self.assertEqual(stored["index_path"], self.dir / "hash.hnsw")
+        loaded = storage.hnswlib.Index(space='cosine', dim=8)
+        loaded.load_index(str(stored["index_path"]), max_elements=20)
+        labels, _ = loaded.knn_query(embeddings[7], k=1)
+        self.assertEqual(int(labels[0][0]), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()